@@ -0,0 +1,24 @@
+"""Gunicorn settings for serving the backend in production"""
+import multiprocessing
+import os
+
+# Application lives in src/, next to its stock_names.json and .cache/
+chdir = 'src'
+wsgi_app = 'wsgi:app'
+bind = f"0.0.0.0:{os.getenv('PORT', '5001')}"
+
+# Threaded workers: yfinance (curl_cffi) and Gemini (grpc) do their I/O in
+# C extensions that gevent cannot make cooperative, so real threads are
+# what keep a worker serving other requests while one waits on Yahoo
+worker_class = 'gthread'
+workers = int(os.getenv('WEB_CONCURRENCY', min(4, multiprocessing.cpu_count() * 2)))
+threads = int(os.getenv('GUNICORN_THREADS', 16))
+
+# Stress tests stream across two Gemini calls (up to 25s each)
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 60))
+graceful_timeout = 30
+keepalive = 5
+
+# Errors go to stderr; per-request access lines are opt-in (e.g. a file path)
+errorlog = '-'
+accesslog = os.getenv('GUNICORN_ACCESS_LOG')
@@ -27,8 +27,15 @@ function App() {
     try {
       const response = await fetch(`http://localhost:5001/api/search-stocks?q=${encodeURIComponent(query)}`);
       const data = await response.json();
-      setSearchResults(data.results || []);
-      setShowSuggestions(data.results && data.results.length > 0);
+      const results = data.results || [];
+      setSearchResults(results);
+      setShowSuggestions(results.length > 0);
+
+      // Suggestions arrive without prices; fill them in with one batched quote call
+      const unpriced = results.filter((stock) => stock.price == null).map((stock) => stock.ticker);
+      if (unpriced.length > 0) {
+        backfillPrices(unpriced);
+      }
     } catch (error) {
       console.error('Error searching stocks:', error);
       setSearchResults([]);
@@ -37,6 +44,20 @@ function App() {
     }
   };
 
+  // Fetch prices for suggestion tickers and merge them into the dropdown
+  const backfillPrices = async (tickers) => {
+    try {
+      const response = await fetch(`http://localhost:5001/api/quote?tickers=${encodeURIComponent(tickers.join(','))}`);
+      const data = await response.json();
+      const quotes = data.quotes || {};
+      setSearchResults((current) => current.map((stock) => (
+        quotes[stock.ticker] != null ? { ...stock, price: quotes[stock.ticker] } : stock
+      )));
+    } catch (error) {
+      console.error('Error fetching suggestion prices:', error);
+    }
+  };
+
   // Debounce search to avoid too many API calls
   const handleTickerChange = (value) => {
     setTicker(value);
@@ -58,6 +79,10 @@ function App() {
     setTicker(stock.ticker);
     setSearchResults([]);
     setShowSuggestions(false);
+
+    // Warm the backend price cache so validation on "Add Stock" is instant
+    fetch(`http://localhost:5001/api/quote?ticker=${encodeURIComponent(stock.ticker)}`)
+      .catch((error) => console.error('Error fetching quote:', error));
   };
 
   // Add stock to portfolio
@@ -137,14 +162,46 @@ function App() {
         body: JSON.stringify({ portfolio }),
       });
 
-      const data = await response.json();
-      
-      if (response.ok) {
-        setStressTestResults(data.results);
-        setAiInsights(data.ai_insights);
-        setError('');
-      } else {
+      if (!response.ok) {
+        const data = await response.json();
         setError(data.error || 'Failed to run stress test');
+        return;
+      }
+
+      // The backend streams NDJSON: portfolio value first, then each scenario
+      // as Gemini produces it, then the full results, then AI insights
+      setAiInsights('');
+      const reader = response.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = '';
+      while (true) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        const lines = buffer.split('\n');
+        buffer = lines.pop();
+        for (const line of lines) {
+          if (!line.trim()) continue;
+          const message = JSON.parse(line);
+          if (message.type === 'prices') {
+            setStressTestResults({
+              current_value: message.current_value,
+              stock_details: message.stock_details,
+            });
+            setError('');
+          } else if (message.type === 'scenario') {
+            setStressTestResults((current) => ({
+              ...current,
+              scenarios: [...(current?.scenarios || []), message.scenario],
+            }));
+          } else if (message.type === 'results') {
+            setStressTestResults(message.results);
+          } else if (message.type === 'insights') {
+            setAiInsights(message.ai_insights);
+          } else if (message.type === 'error') {
+            setError(message.error || 'Failed to run stress test');
+          }
+        }
       }
     } catch (error) {
       console.error('Error running stress test:', error);
@@ -201,10 +258,12 @@ function App() {
                         <span className="suggestion-ticker">{stock.ticker}</span>
                         <span className="suggestion-name">{stock.name}</span>
                       </div>
-                      <div className="suggestion-details">
-                        <span className="suggestion-price">${stock.price?.toFixed(2)}</span>
-                        <span className="suggestion-sector">{stock.sector}</span>
-                      </div>
+                      {stock.price != null && (
+                        <div className="suggestion-details">
+                          <span className="suggestion-price">${stock.price.toFixed(2)}</span>
+                          <span className="suggestion-sector">{stock.sector}</span>
+                        </div>
+                      )}
                     </div>
                   ))}
                 </div>
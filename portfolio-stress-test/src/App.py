@@ -1,20 +1,86 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, stream_with_context
+from flask.json.provider import JSONProvider
+from flask_compress import Compress
 from flask_cors import CORS, cross_origin
 import yfinance as yf
+import numpy as np
 import os
 from datetime import datetime
 import google.generativeai as genai
 from dotenv import load_dotenv
+import hashlib
 import json
+import logging
+import logging.handlers
+import math
+import orjson
+import queue
+import re
+import threading
+import time
+import zlib
+from collections import defaultdict
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from functools import lru_cache
+from typing import NamedTuple
 
 # Load environment variables
 load_dotenv()
 
+# Log through the logging module so DEBUG detail costs nothing unless enabled;
+# LOG_FILE adds a rotating file next to the console stream, LOG_LEVEL sets the
+# level; an unknown LOG_LEVEL falls back to INFO instead of failing at import
+LOG_LEVEL = (os.getenv('LOG_LEVEL') or 'INFO').upper()
+# getLevelName maps a known name to its number and anything else to a string
+_log_level = logging.getLevelName(LOG_LEVEL)
+logging.basicConfig(
+    level=_log_level if isinstance(_log_level, int) else logging.INFO,
+    format='%(asctime)s %(levelname)s %(name)s: %(message)s'
+)
+log = logging.getLogger("stress")
+if not isinstance(_log_level, int):
+    log.warning("Unknown LOG_LEVEL %r, using INFO", LOG_LEVEL)
+if os.getenv('LOG_FILE'):
+    _file_handler = logging.handlers.RotatingFileHandler(os.getenv('LOG_FILE'), maxBytes=10 * 1024 * 1024, backupCount=3)
+    _file_handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(name)s: %(message)s'))
+    log.addHandler(_file_handler)
+
 # Configure Gemini
 genai.configure(api_key=os.getenv('GEMINI_API_KEY'))
-model = genai.GenerativeModel('gemini-2.5-flash')
+GEMINI_MODEL = os.getenv('GEMINI_MODEL', 'gemini-2.5-flash')
+
+@lru_cache(maxsize=None)
+def _get_model(name=GEMINI_MODEL):
+    """Return the shared GenerativeModel handle for a model name"""
+    return genai.GenerativeModel(name)
+
+# Seconds before a Gemini call is abandoned in favour of the fallback content
+GEMINI_TIMEOUT = 25
+
+class OrjsonProvider(JSONProvider):
+    """Flask JSON provider backed by orjson, used for request parsing"""
+    
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY).decode()
+    
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
 
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
+
+# Compress JSON bodies. Flask-Compress only flushes streams at the end, which
+# would hold back every NDJSON phase, so stress_test gzips its own stream
+app.config['COMPRESS_ALGORITHM'] = ['br', 'gzip']
+app.config['COMPRESS_MIN_SIZE'] = 500
+app.config['COMPRESS_STREAMS'] = False
+Compress(app)
+
+# Runs scenario generation off the request thread so it overlaps with the
+# valuation. Each stress test holds one task, so the pool defaults to the
+# Gunicorn threads per worker to avoid queueing
+AI_MAX_WORKERS = int(os.getenv('AI_MAX_WORKERS', os.getenv('GUNICORN_THREADS', 16)))
+_ai_executor = ThreadPoolExecutor(max_workers=AI_MAX_WORKERS)
 
 # Configure CORS properly
 CORS(app, resources={
@@ -26,83 +92,506 @@ CORS(app, resources={
     }
 })
 
+def _gzip_lines(lines):
+    """Gzip a stream of NDJSON lines, flushing after each so none is held back"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+    for line in lines:
+        yield compressor.compress(line) + compressor.flush(zlib.Z_SYNC_FLUSH)
+    yield compressor.flush()
+
+def _json_response(obj, status=200):
+    """Serialize obj with orjson (handles datetimes and NumPy scalars natively)"""
+    return Response(orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY), status=status, mimetype='application/json')
+
+class FileCache:
+    """JSON-on-disk cache with a fixed TTL, fronted by a bounded in-process map"""
+    
+    # Seconds between sweeps of the cache directory for expired files
+    PRUNE_INTERVAL = 300
+    
+    def __init__(self, directory, ttl, maxsize=1024):
+        # Each cache owns its directory, so pruning never touches another
+        # cache's files (they have different TTLs)
+        self.directory = directory
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._memory = {}
+        self._lock = threading.Lock()
+        self._last_prune = 0.0
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(directory, exist_ok=True)
+    
+    def _path(self, key):
+        safe_key = re.sub(r'[^A-Za-z0-9._^=-]', '_', key)
+        return os.path.join(self.directory, f"{safe_key}.json")
+    
+    def _remember(self, key, timestamp, value):
+        with self._lock:
+            self._memory.pop(key, None)
+            self._memory[key] = (timestamp, value)
+            if len(self._memory) > self.maxsize:
+                # Drop the least recently stored entry
+                self._memory.pop(next(iter(self._memory)))
+    
+    def _count(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+    
+    def get(self, key):
+        """Return the cached value for key, or None if it is missing or expired"""
+        entry = self._memory.get(key)
+        if entry is not None and time.time() - entry[0] < self.ttl:
+            self._count(True)
+            return entry[1]
+        
+        try:
+            with open(self._path(key), 'rb') as f:
+                entry = orjson.loads(f.read())
+        except (OSError, ValueError):
+            self._count(False)
+            return None
+        timestamp = entry.get('timestamp', 0)
+        if time.time() - timestamp >= self.ttl:
+            self._count(False)
+            self._unlink(self._path(key))
+            return None
+        self._remember(key, timestamp, entry.get('value'))
+        self._count(True)
+        return entry.get('value')
+    
+    def stats(self):
+        """Return hit/miss counts and the current in-memory size"""
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'entries': len(self._memory)}
+    
+    def set(self, key, value):
+        """Store value under key, stamped with the current time"""
+        timestamp = time.time()
+        self._remember(key, timestamp, value)
+        
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, 'wb') as f:
+                f.write(orjson.dumps({'timestamp': timestamp, 'value': value}))
+            os.replace(tmp_path, path)
+        except OSError as e:
+            log.warning("Error writing cache entry %s: %s", key, e)
+        
+        if timestamp - self._last_prune >= min(self.ttl, self.PRUNE_INTERVAL):
+            self._last_prune = timestamp
+            self._prune(timestamp)
+    
+    def _unlink(self, path):
+        try:
+            os.unlink(path)
+        except OSError:
+            # Another worker may have removed or replaced it already
+            pass
+    
+    def _prune(self, now):
+        """Delete expired files, then the oldest ones beyond maxsize"""
+        try:
+            entries = [entry for entry in os.scandir(self.directory) if entry.is_file()]
+        except OSError as e:
+            log.warning("Error scanning cache directory %s: %s", self.directory, e)
+            return
+        
+        # Files are written once via os.replace, so mtime is their timestamp
+        fresh = []
+        for entry in entries:
+            try:
+                mtime = entry.stat().st_mtime
+            except OSError:
+                continue
+            if now - mtime >= self.ttl:
+                self._unlink(entry.path)
+            else:
+                fresh.append((mtime, entry.path))
+        
+        fresh.sort()
+        for _, path in fresh[:max(0, len(fresh) - self.maxsize)]:
+            self._unlink(path)
+
+# Prices go stale quickly; names and sectors effectively never change
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache')
+PRICE_CACHE_TTL = int(os.getenv('PRICE_CACHE_TTL', 60))
+META_CACHE_TTL = int(os.getenv('META_CACHE_TTL', 24 * 60 * 60))
+_price_cache = FileCache(os.path.join(CACHE_DIR, 'prices'), ttl=PRICE_CACHE_TTL)
+_meta_cache = FileCache(os.path.join(CACHE_DIR, 'meta'), ttl=META_CACHE_TTL)
+
+# Gemini output is deterministic enough per portfolio composition to reuse
+AI_CACHE_TTL = int(os.getenv('AI_CACHE_TTL', 60 * 60))
+_ai_cache = FileCache(os.path.join(CACHE_DIR, 'ai'), ttl=AI_CACHE_TTL, maxsize=256)
+
+# Scenarios depend on which names are held, not on share counts, and are
+# shared across similar portfolios, so they expire sooner than insights
+SCENARIO_CACHE_TTL = int(os.getenv('SCENARIO_CACHE_TTL', 10 * 60))
+_scenario_cache = FileCache(os.path.join(CACHE_DIR, 'scenarios'), ttl=SCENARIO_CACHE_TTL, maxsize=256)
+
+# Note: yfinance already routes every Ticker/download call through one shared
+# curl_cffi session per process, so keep-alive connections to Yahoo are reused
+# across requests without passing session=. Plain requests.Session objects
+# are accepted but get blocked by Yahoo, and caching sessions (requests_cache)
+# are rejected outright, which is why response caching lives in FileCache
+# rather than at the HTTP layer.
+
+# Retries for transient network errors go through yfinance's own config
+# (exponential backoff from 1s), standing in for a urllib3 Retry adapter
+YF_RETRIES = int(os.getenv('YF_RETRIES', 1))
+yf.config.network.retries = YF_RETRIES
+
+def _reset_after_fork():
+    """Give each forked server worker its own executor and cache locks"""
+    global _ai_executor, _inflight_lock
+    _ai_executor = ThreadPoolExecutor(max_workers=AI_MAX_WORKERS)
+    _inflight_lock = threading.Lock()
+    _inflight.clear()
+    for cache in (_price_cache, _meta_cache, _ai_cache, _scenario_cache):
+        cache._lock = threading.Lock()
+
+# Gunicorn forks workers from the master; never share the parent's threads/locks
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+# Yahoo caps the number of symbols accepted per batched quote request
+YF_BATCH_SIZE = 20
+
+# Upper bound on concurrent per-ticker yfinance requests
+YF_MAX_WORKERS = 16
+
+# Seconds to wait on a single Yahoo request before treating it as failed
+YF_TIMEOUT = 5
+
+def fetch_concurrently(fn, tickers, default=None):
+    """Run a blocking per-ticker fetch for every ticker in parallel, preserving order"""
+    if not tickers:
+        return []
+    # Tickers still pending after YF_TIMEOUT get default, so one slow symbol
+    # cannot hold up the whole request
+    executor = ThreadPoolExecutor(max_workers=min(YF_MAX_WORKERS, len(tickers)))
+    futures = [executor.submit(fn, ticker) for ticker in tickers]
+    done, _ = wait(futures, timeout=YF_TIMEOUT)
+    executor.shutdown(wait=False, cancel_futures=True)
+    
+    results = []
+    for ticker, future in zip(tickers, futures):
+        if future in done:
+            results.append(future.result())
+        else:
+            log.warning("Timed out fetching data for %s", ticker)
+            results.append(default(ticker) if callable(default) else default)
+    return results
+
+# Friendly names for indices and commodities, mapped to Yahoo Finance symbols
+TICKER_ALIASES = {
+    "SPX": "^GSPC",
+    "GOLD": "GC=F",
+    "DJI": "^DJI",
+    "NASDAQ": "^IXIC",
+    "VIX": "^VIX",
+    # Share classes use a dash on Yahoo; Block trades as XYZ since its rename
+    "BRK.B": "BRK-B",
+    "BRK.A": "BRK-A",
+    "SQ": "XYZ"
+}
+
+@lru_cache(maxsize=4096)
+def resolve_symbol(ticker):
+    """Map friendly aliases to their Yahoo Finance symbols"""
+    # Yahoo symbols are case-insensitive; normalizing keeps one cache entry per symbol
+    ticker_upper = ticker.upper()
+    return TICKER_ALIASES.get(ticker_upper, ticker_upper)
+
+# One in-flight fetch per cache key; concurrent callers wait on its Future
+_inflight = {}
+_inflight_lock = threading.Lock()
+
+def _coalesced(key, fetch):
+    """Call fetch() once for all concurrent callers asking for the same key"""
+    with _inflight_lock:
+        future = _inflight.get(key)
+        is_owner = future is None
+        if is_owner:
+            future = _inflight[key] = Future()
+    
+    if not is_owner:
+        return future.result()
+    
+    try:
+        result = fetch()
+        future.set_result(result)
+        return result
+    except BaseException as e:
+        future.set_exception(e)
+        raise
+    finally:
+        with _inflight_lock:
+            _inflight.pop(key, None)
+
+def get_stock_price(ticker):
+    """Fetch the latest price for a ticker from a short daily history window"""
+    symbol = resolve_symbol(ticker)
+    cached_price = _price_cache.get(f"{symbol}_quote")
+    if cached_price is not None:
+        return cached_price
+    
+    return _coalesced(f"{symbol}_quote", lambda: _fetch_stock_price(ticker, symbol))
+
+def _fetch_stock_price(ticker, symbol):
+    try:
+        # fast_info.last_price downloads a full year of daily bars; five days
+        # is enough to find the last close across weekends and holidays
+        stock = yf.Ticker(symbol)
+        hist = stock.history(period="5d", timeout=YF_TIMEOUT)
+        closes = hist['Close'].dropna() if not hist.empty else hist
+        if not closes.empty:
+            current_price = closes.iloc[-1]
+        else:
+            # The chart response still carries the live quote when bars are missing
+            current_price = stock.get_history_metadata().get('regularMarketPrice', 0)
+    except Exception as e:
+        log.warning("Error fetching price for %s: %s", ticker, e)
+        return 0
+    
+    current_price = float(current_price) if current_price and current_price > 0 else 0
+    if current_price > 0:
+        _price_cache.set(f"{symbol}_quote", current_price)
+    return current_price
+
 def get_stock_data(ticker):
     """Fetch current stock data using yfinance"""
-    try:
-        ticker_upper = ticker.upper()
-        if ticker_upper == "SPX":
-            stock = yf.Ticker("^GSPC")
-        elif ticker_upper == "GOLD":
-            stock = yf.Ticker("GC=F")
+    current_price = get_stock_price(ticker)
+    
+    # Skip the heavier metadata lookup for symbols that have no price
+    if current_price <= 0:
+        return {'ticker': ticker, 'current_price': 0, 'name': ticker, 'sector': 'Unknown'}
+    
+    return {
+        'ticker': ticker,
+        'current_price': current_price,
+        **get_stock_meta(ticker)
+    }
+
+def get_stock_prices(tickers):
+    """Fetch latest prices for many tickers using batched yf.download requests"""
+    symbols = {ticker: resolve_symbol(ticker) for ticker in tickers}
+    prices = {}
+    missing = []
+    for symbol in dict.fromkeys(symbols.values()):
+        cached_price = _price_cache.get(f"{symbol}_quote")
+        if cached_price is not None:
+            prices[symbol] = cached_price
         else:
-            stock = yf.Ticker(ticker)
-        info = stock.info
-        current_price = info.get('currentPrice') or info.get('regularMarketPrice') or info.get('regularMarketOpen')
-        
-        if not current_price:
-            # Try getting recent price from history
-            hist = stock.history(period="1d")
-            if not hist.empty:
-                current_price = hist['Close'].iloc[-1]
-        
-        return {
-            'ticker': ticker,
-            'current_price': float(current_price) if current_price else 0,
+            missing.append(symbol)
+    
+    for i in range(0, len(missing), YF_BATCH_SIZE):
+        chunk = missing[i:i + YF_BATCH_SIZE]
+        # Callers asking for the same chunk at once (the valuation and the
+        # scenario prompt in stress_test) share a single download
+        prices.update(_coalesced(f"prices_{' '.join(chunk)}", lambda chunk=chunk: _download_prices(chunk)))
+    
+    return {ticker: prices.get(symbol, 0) for ticker, symbol in symbols.items()}
+
+def _download_prices(chunk):
+    try:
+        data = yf.download(" ".join(chunk), period="5d", group_by="ticker", threads=True,
+                           progress=False, timeout=YF_TIMEOUT)
+    except Exception as e:
+        log.warning("Error downloading prices for %s: %s", ', '.join(chunk), e)
+        return {}
+    
+    prices = {}
+    for symbol in chunk:
+        try:
+            # Single-symbol downloads may come back without the ticker column level
+            frame = data[symbol] if data.columns.nlevels > 1 else data
+            closes = frame['Close'].dropna()
+        except KeyError:
+            continue
+        if not closes.empty:
+            prices[symbol] = float(closes.iloc[-1])
+            _price_cache.set(f"{symbol}_quote", prices[symbol])
+    return prices
+
+def get_stock_meta(ticker):
+    """Fetch display metadata (name and sector) for a ticker"""
+    symbol = resolve_symbol(ticker)
+    meta = _meta_cache.get(f"{symbol}_meta")
+    if meta is not None:
+        return meta
+    
+    return _coalesced(f"{symbol}_meta", lambda: _fetch_stock_meta(ticker, symbol))
+
+def _fetch_stock_meta(ticker, symbol):
+    try:
+        info = yf.Ticker(symbol).get_info()
+        meta = {
             'name': info.get('longName', ticker),
             'sector': info.get('sector', 'Unknown')
         }
+        # An info payload without a name is Yahoo not knowing the symbol;
+        # don't pin that placeholder in the 24h cache
+        if 'longName' in info:
+            _meta_cache.set(f"{symbol}_meta", meta)
+        return meta
     except Exception as e:
-        print(f"Error fetching data for {ticker}: {e}")
-        return None
+        log.warning("Error fetching metadata for %s: %s", ticker, e)
+        return {'name': ticker, 'sector': 'Unknown'}
+
+def get_stock_data_batch(tickers):
+    """Fetch get_stock_data-style records for many tickers at once"""
+    # Fetch every price in one batched request instead of one round trip per ticker
+    prices = get_stock_prices(tickers)
+    priced = [ticker for ticker in dict.fromkeys(tickers) if prices.get(ticker, 0) > 0]
+    
+    # Metadata still needs one request per ticker (usually a cache hit), so
+    # issue them in parallel and only for symbols that actually have a price
+    metas = fetch_concurrently(get_stock_meta, priced, default=lambda ticker: {'name': ticker, 'sector': 'Unknown'})
+    meta_by_ticker = dict(zip(priced, metas))
+    
+    return {
+        ticker: {
+            'ticker': ticker,
+            'current_price': prices.get(ticker, 0),
+            **meta_by_ticker.get(ticker, {'name': ticker, 'sector': 'Unknown'})
+        }
+        for ticker in tickers
+    }
+
+class PortfolioArrays(NamedTuple):
+    """Structure-of-arrays view of the priced holdings, aligned by index"""
+    tickers: list
+    prices: np.ndarray
+    shares: np.ndarray
+    sectors: np.ndarray
+    
+    @property
+    def values(self):
+        return self.prices * self.shares
+
+def aggregate_holdings(portfolio_data):
+    """Merge repeated lots of the same ticker into one share count per ticker"""
+    # Normalized first, so "aapl" and "AAPL " count as the same symbol
+    holdings = {}
+    for stock in portfolio_data:
+        ticker = stock['ticker'].strip().upper()
+        # float() also accepts "nan", "inf" and negatives, none of which value a holding
+        shares = float(stock['shares'])
+        if not (math.isfinite(shares) and shares > 0):
+            raise ValueError(f"Invalid share count for {ticker}: {stock['shares']}")
+        holdings[ticker] = holdings.get(ticker, 0.0) + shares
+    return holdings
 
 def calculate_portfolio_value(portfolio_data):
     """Calculate total portfolio value"""
-    total_value = 0
     stock_details = []
     
-    for stock in portfolio_data:
-        ticker = stock['ticker']
-        shares = stock['shares']
-        
-        stock_data = get_stock_data(ticker)
-        if stock_data and stock_data['current_price'] > 0:
-            value = stock_data['current_price'] * shares
-            total_value += value
-            stock_details.append({
-                **stock_data,
-                'shares': shares,
-                'value': value
-            })
+    # Each symbol is fetched once, however many lots the user entered
+    holdings = aggregate_holdings(portfolio_data)
+    
+    stock_data = get_stock_data_batch(list(holdings))
+    
+    priced = []
+    for ticker in holdings:
+        if stock_data[ticker]['current_price'] > 0:
+            priced.append(ticker)
         else:
-            print(f"Warning: Could not fetch valid data for {ticker}")
+            log.warning("Could not fetch valid data for %s", ticker)
+    
+    portfolio_arrays = PortfolioArrays(
+        tickers=priced,
+        prices=np.array([stock_data[ticker]['current_price'] for ticker in priced], dtype=np.float64),
+        shares=np.array([holdings[ticker] for ticker in priced], dtype=np.float64),
+        sectors=np.array([stock_data[ticker]['sector'] for ticker in priced], dtype=object)
+    )
+    values = portfolio_arrays.values
+    total_value = float(values.sum())
+    
+    for ticker, value in zip(priced, values):
+        stock_details.append({
+            **stock_data[ticker],
+            'shares': holdings[ticker],
+            'value': float(value)
+        })
     
-    return total_value, stock_details
+    return total_value, stock_details, portfolio_arrays
 
-def generate_stress_scenarios(stock_details, current_value):
-    """Generate stress test scenarios using Gemini AI"""
-    try:
-        # Prepare portfolio summary for AI
-        portfolio_summary = []
-        sectors = set()
-        for stock in stock_details:
-            portfolio_summary.append({
-                'ticker': stock['ticker'],
-                'name': stock['name'],
-                'sector': stock['sector'],
-                'percentage': (stock['value'] / current_value) * 100
-            })
-            sectors.add(stock['sector'])
-        
-        # Create prompt for scenario generation
-        prompt = f"""You are a financial risk analyst. Generate 6 realistic market scenarios for this portfolio - both downside risks AND upside opportunities.
+# Scenarios used when Gemini is unavailable (3 downside, 3 upside)
+FALLBACK_SCENARIOS = [
+    # Downside scenarios
+    {
+        "name": "Market Crash",
+        "description": "Severe market downturn similar to 2008 financial crisis",
+        "impact": -40
+    },
+    {
+        "name": "Tech Sector Correction",
+        "description": "Technology sector experiences significant correction",
+        "impact": -25,
+        "sector": "Technology"
+    },
+    {
+        "name": "Interest Rate Shock",
+        "description": "Federal Reserve raises rates aggressively",
+        "impact": -15
+    },
+    # Upside scenarios
+    {
+        "name": "Bull Market Rally",
+        "description": "Strong economic growth and optimism drive broad market gains",
+        "impact": 35
+    },
+    {
+        "name": "Tech Innovation Boom",
+        "description": "Major technological breakthrough drives tech sector surge",
+        "impact": 30,
+        "sector": "Technology"
+    },
+    {
+        "name": "Rate Cut Catalyst",
+        "description": "Federal Reserve cuts rates, boosting market sentiment",
+        "impact": 20
+    }
+]
+
+# Shape Gemini must follow for the scenario array; with the schema enforced
+# the prompt no longer needs format instructions or an example payload
+SCENARIO_SCHEMA = {
+    "type": "array",
+    "items": {
+        "type": "object",
+        "properties": {
+            "name": {"type": "string"},
+            "description": {"type": "string"},
+            "impact": {"type": "integer"}
+        },
+        "required": ["name", "description", "impact"]
+    }
+}
+
+# Gemini 2.5 counts thinking tokens against max_output_tokens, so the cap
+# leaves headroom above the ~400 tokens the six-scenario array needs
+SCENARIO_GENERATION_CONFIG = {
+    "response_mime_type": "application/json",
+    "response_schema": SCENARIO_SCHEMA,
+    "max_output_tokens": 4096,
+    "temperature": 0.7
+}
+
+# Prompt templates are filled with str.format
+_SCENARIO_PROMPT = """You are a financial risk analyst. Generate 6 realistic market scenarios for this portfolio - both downside risks AND upside opportunities.
 
 Portfolio Overview:
 - Total Value: ${current_value:,.2f}
-- Number of Holdings: {len(stock_details)}
-- Sectors Represented: {', '.join(sectors)}
+- Number of Holdings: {num_holdings}
+- Sectors Represented: {sectors}
 
 Holdings:
-{chr(10).join([f"- {s['ticker']} ({s['name']}): {s['percentage']:.1f}%, Sector: {s['sector']}" for s in portfolio_summary])}
+{holdings}
 
 Generate 6 scenarios split evenly:
 - 3 DOWNSIDE scenarios (negative impact): Market crashes, corrections, bear markets, etc.
@@ -114,143 +603,214 @@ Make scenarios:
 3. Varied in severity (from moderate to extreme)
 4. Include at least one sector-specific scenario for both upside and downside
 
-For each scenario, provide:
-- name: A concise, clear name (e.g., "AI Boom", "Tech Correction", "Bull Market Rally")
-- description: A brief description of the event (one sentence)
-- impact: The estimated percentage impact on portfolio value
-  * For DOWNSIDE: Use negative numbers between -10 and -60
-  * For UPSIDE: Use positive numbers between +10 and +60
-
-Return ONLY a valid JSON array with 6 scenarios in this exact format:
-[
-  {{
-    "name": "Bull Market Rally",
-    "description": "Strong economic growth drives broad market gains",
-    "impact": 35
-  }},
-  {{
-    "name": "Market Crash",
-    "description": "Severe market downturn similar to 2008 financial crisis",
-    "impact": -40
-  }},
-  ...
-]
+For each scenario:
+- name: A concise, clear name (e.g., "AI Boom", "Tech Correction")
+- description: One sentence describing the event
+- impact: Estimated percentage impact on portfolio value, -60 to -10 for DOWNSIDE and +10 to +60 for UPSIDE"""
+
+def _signature(composition):
+    """Hash tickers or (ticker, amount) pairs, in any order, into a stable cache key"""
+    return hashlib.blake2b(orjson.dumps(sorted(composition)), digest_size=16).hexdigest()
+
+def portfolio_signature(portfolio_summary):
+    """Hash the holdings and their rounded weights into a stable cache key"""
+    return _signature((s['ticker'], round(s['percentage'])) for s in portfolio_summary)
 
-Do not include any markdown formatting, code blocks, or explanatory text. Return only the raw JSON array."""
+# JSON mode should never emit markdown fences, but older models occasionally
+# do; one precompiled pass strips them without a startswith/replace ladder
+_FENCE = re.compile(r'^```(?:json)?\s*|\s*```\s*$', re.M)
+
+# Stdlib decoder for raw_decode, which orjson does not offer
+_json_decoder = json.JSONDecoder()
+
+def iter_json_array(chunks):
+    """Yield each element of a streamed JSON array as soon as its text is complete"""
+    buffer = ''
+    for chunk in chunks:
+        buffer += chunk
+        while True:
+            # Skip the opening bracket, separators and whitespace between elements
+            start = len(buffer) - len(buffer.lstrip('[, \t\r\n'))
+            if start == len(buffer) or buffer[start] == ']':
+                buffer = buffer[start:]
+                break
+            try:
+                # Elements are objects, so a partial one never decodes early
+                element, end = _json_decoder.raw_decode(buffer, start)
+            except ValueError:
+                break
+            buffer = buffer[end:]
+            yield element
+
+def _response_texts(response):
+    """Yield the text of each streamed Gemini chunk that carries any"""
+    for chunk in response:
+        if chunk.parts:
+            yield chunk.text
+
+def generate_stress_scenarios(portfolio, on_scenario=None, cancelled=None):
+    """Generate stress test scenarios using Gemini AI"""
+    try:
+        holdings = aggregate_holdings(portfolio)
+        
+        # Price and metadata lookups are cached and coalesced, so this shares
+        # the valuation's Yahoo requests instead of repeating them; symbols
+        # without a price are dropped before any metadata request
+        prices = get_stock_prices(list(holdings))
+        tickers = [ticker for ticker in holdings if prices[ticker] > 0]
+        if not tickers or (cancelled is not None and cancelled.is_set()):
+            return FALLBACK_SCENARIOS
+        
+        # Keyed by the ticker set alone: re-runs with tweaked share counts reuse them
+        cache_key = f"scenarios_{_signature(tickers)}"
+        cached_scenarios = _scenario_cache.get(cache_key)
+        if cached_scenarios is not None:
+            log.info("Reusing %d cached AI scenarios", len(cached_scenarios))
+            return cached_scenarios
+        
+        metas = fetch_concurrently(get_stock_meta, tickers, default=lambda ticker: {'name': ticker, 'sector': 'Unknown'})
+        
+        # Create prompt for scenario generation
+        values = {ticker: prices[ticker] * holdings[ticker] for ticker in tickers}
+        current_value = sum(values.values())
+        holdings_text = '\n'.join(
+            f"- {ticker} ({meta['name']}): {values[ticker] / current_value * 100:.1f}%, Sector: {meta['sector']}"
+            for ticker, meta in zip(tickers, metas)
+        )
+        prompt = _SCENARIO_PROMPT.format(
+            current_value=current_value,
+            num_holdings=len(tickers),
+            # Sorted so the same holdings always produce the same prompt text
+            sectors=', '.join(sorted({meta['sector'] for meta in metas})),
+            holdings=holdings_text
+        )
+        
+        # The request may have failed while metadata was loading
+        if cancelled is not None and cancelled.is_set():
+            return FALLBACK_SCENARIOS
         
         # Call Gemini API
-        response = model.generate_content(prompt)
-        response_text = response.text.strip()
+        # The response schema makes Gemini return the bare array, with no markdown fences
+        response = _get_model().generate_content(
+            prompt,
+            generation_config=SCENARIO_GENERATION_CONFIG,
+            request_options={"timeout": GEMINI_TIMEOUT},
+            stream=True
+        )
         
-        # Clean up response (remove markdown code blocks if present)
-        if response_text.startswith('```json'):
-            response_text = response_text.replace('```json', '').replace('```', '').strip()
-        elif response_text.startswith('```'):
-            response_text = response_text.replace('```', '').strip()
+        # Hand each scenario to the caller as soon as it has streamed in
+        texts = []
+        def collect():
+            for text in _response_texts(response):
+                texts.append(text)
+                yield text
+        for scenario in iter_json_array(collect()):
+            if on_scenario is not None:
+                on_scenario(scenario)
+        response_text = _FENCE.sub('', ''.join(texts)).strip()
         
-        # Parse JSON response
-        scenarios = json.loads(response_text)
+        # Parse the complete JSON response; it is authoritative over the partial elements
+        scenarios = orjson.loads(response_text)
         
-        print(f"✅ Generated {len(scenarios)} AI-powered scenarios ({len([s for s in scenarios if s['impact'] > 0])} upside, {len([s for s in scenarios if s['impact'] < 0])} downside)")
+        log.info("Generated %d AI-powered scenarios (%d upside, %d downside)", len(scenarios),
+                 sum(s['impact'] > 0 for s in scenarios), sum(s['impact'] < 0 for s in scenarios))
+        if cancelled is None or not cancelled.is_set():
+            _scenario_cache.set(cache_key, scenarios)
         return scenarios
         
     except Exception as e:
-        print(f"❌ Error generating scenarios with AI: {e}")
-        print(f"Response text: {response_text if 'response_text' in locals() else 'N/A'}")
+        log.error("Error generating scenarios with AI: %s", e)
+        log.debug("Response text: %s", response_text if 'response_text' in locals() else 'N/A')
         
         # Fallback to basic scenarios if AI fails (3 positive, 3 negative)
-        return [
-            # Downside scenarios
-            {
-                "name": "Market Crash",
-                "description": "Severe market downturn similar to 2008 financial crisis",
-                "impact": -40
-            },
-            {
-                "name": "Tech Sector Correction",
-                "description": "Technology sector experiences significant correction",
-                "impact": -25
-            },
-            {
-                "name": "Interest Rate Shock",
-                "description": "Federal Reserve raises rates aggressively",
-                "impact": -15
-            },
-            # Upside scenarios
-            {
-                "name": "Bull Market Rally",
-                "description": "Strong economic growth and optimism drive broad market gains",
-                "impact": 35
-            },
-            {
-                "name": "Tech Innovation Boom",
-                "description": "Major technological breakthrough drives tech sector surge",
-                "impact": 30
-            },
-            {
-                "name": "Rate Cut Catalyst",
-                "description": "Federal Reserve cuts rates, boosting market sentiment",
-                "impact": 20
-            }
-        ]
+        return FALLBACK_SCENARIOS
+
+def compute_scenario_changes(values, shocks):
+    """Return the portfolio value change for every scenario"""
+    # values: (n_stocks,), shocks: (n_scenarios, n_stocks) fractional moves;
+    # one matrix product, so thousands of simulated scenarios cost the same call
+    return values @ shocks.T
+
+class ScenarioArrays(NamedTuple):
+    """Parallel arrays/lists describing a scenario set, aligned by index"""
+    names: list
+    descriptions: list
+    impacts: list
+    sectors: list
+    impact_fracs: np.ndarray
+
+def compile_scenarios(scenarios):
+    """Convert a list of scenario dicts into ScenarioArrays"""
+    return ScenarioArrays(
+        names=[scenario['name'] for scenario in scenarios],
+        descriptions=[scenario['description'] for scenario in scenarios],
+        impacts=[scenario['impact'] for scenario in scenarios],
+        sectors=[scenario.get('sector') for scenario in scenarios],
+        impact_fracs=np.fromiter(
+            (scenario['impact'] for scenario in scenarios), dtype=np.float64, count=len(scenarios)
+        ) / 100
+    )
 
-def run_stress_scenarios(scenarios, current_value, stock_details):
+def sector_shocks(compiled, sector_names):
+    """Return the (n_scenarios, n_sectors) matrix of fractional moves per sector"""
+    # Scenarios without a 'sector' key move every sector by their impact
+    exposed = np.array([
+        [sector is None or sector == name for name in sector_names]
+        for sector in compiled.sectors
+    ], dtype=np.float64).reshape(len(compiled.sectors), len(sector_names))
+    return exposed * compiled.impact_fracs[:, None]
+
+# The fallback set never changes, so compile it once at import
+_FALLBACK_ARRAYS = compile_scenarios(FALLBACK_SCENARIOS)
+
+def run_stress_scenarios(scenarios, current_value, portfolio_arrays):
     """Run stress test scenarios on portfolio"""
-    scenario_results = []
-    worst_case_value = current_value
-    best_case_value = current_value
-    
-    for scenario in scenarios:
-        impact = scenario['impact'] / 100
-        scenario_value = current_value * (1 + impact)
-        gain_or_loss = scenario_value - current_value
-        
-        scenario_results.append({
-            'name': scenario['name'],
-            'description': scenario['description'],
-            'impact': scenario['impact'],
-            'portfolio_value': scenario_value,
-            'gain_or_loss': gain_or_loss,
-            'loss': abs(gain_or_loss),
+    compiled = _FALLBACK_ARRAYS if scenarios is FALLBACK_SCENARIOS else compile_scenarios(scenarios)
+    
+    # Shocks are defined per sector and expanded to every holding in that sector
+    sector_names, sector_index = np.unique(portfolio_arrays.sectors.astype(str), return_inverse=True)
+    shocks = sector_shocks(compiled, sector_names)[:, sector_index]
+    
+    gains_or_losses = compute_scenario_changes(portfolio_arrays.values, shocks)
+    scenario_values = current_value + gains_or_losses
+    
+    # Sector scenarios move only part of the portfolio, so the reported impact
+    # is the effective one; the direction still comes from the scenario itself
+    portfolio_impacts = gains_or_losses / current_value * 100
+    
+    scenario_results = [
+        {
+            'name': name,
+            'description': description,
+            'impact': round(float(portfolio_impact), 1),
+            'portfolio_value': float(scenario_value),
+            'gain_or_loss': float(gain_or_loss),
+            'loss': float(abs(gain_or_loss)),
             'is_positive': impact > 0
-        })
-        
-        if scenario_value < worst_case_value:
-            worst_case_value = scenario_value
-        if scenario_value > best_case_value:
-            best_case_value = scenario_value
+        }
+        for name, description, impact, portfolio_impact, scenario_value, gain_or_loss in zip(
+            compiled.names, compiled.descriptions, compiled.impacts, portfolio_impacts, scenario_values, gains_or_losses
+        )
+    ]
+    
+    worst_case_value = float(scenario_values.min(initial=current_value))
+    best_case_value = float(scenario_values.max(initial=current_value))
     
     return scenario_results, worst_case_value, best_case_value
 
-def generate_ai_insights(portfolio_data, results, stock_details):
-    """Generate AI-powered insights using Gemini"""
-    try:
-        # Prepare portfolio summary for AI
-        portfolio_summary = []
-        for stock in stock_details:
-            portfolio_summary.append({
-                'ticker': stock['ticker'],
-                'name': stock['name'],
-                'sector': stock['sector'],
-                'shares': stock['shares'],
-                'value': stock['value'],
-                'percentage': (stock['value'] / results['current_value']) * 100
-            })
-        
-        # Create prompt for comprehensive analysis
-        prompt = f"""You are a financial risk analyst. Analyze this portfolio's performance under both market stress and bull market conditions.
+_INSIGHTS_PROMPT = """You are a financial risk analyst. Analyze this portfolio's performance under both market stress and bull market conditions.
 
 Portfolio Overview:
-- Total Value: ${results['current_value']:,.2f}
-- Number of Holdings: {len(stock_details)}
-- Downside Risk: {results['loss_percentage']:.1f}%
-- Upside Potential: {results['gain_percentage']:.1f}%
+- Total Value: ${current_value:,.2f}
+- Number of Holdings: {num_holdings}
+- Downside Risk: {loss_percentage:.1f}%
+- Upside Potential: {gain_percentage:.1f}%
 
 Holdings:
-{chr(10).join([f"- {s['ticker']} ({s['name']}): ${s['value']:,.2f} ({s['percentage']:.1f}%), Sector: {s['sector']}" for s in portfolio_summary])}
+{holdings}
 
 Scenario Analysis:
-{chr(10).join([f"- {sc['name']}: {sc['impact']:+.0f}% impact" for sc in results['scenarios']])}
+{scenarios}
 
 Provide a brief analysis (under 150 words) covering:
 1. How these specific stocks perform in both crash and bull scenarios
@@ -258,22 +818,137 @@ Provide a brief analysis (under 150 words) covering:
 3. One actionable recommendation for risk-reward balance
 
 Be specific to the actual stocks in this portfolio. Use professional, clear language."""
+
+def generate_ai_insights(portfolio_summary, results):
+    """Generate AI-powered insights using Gemini"""
+    # The prompt cites the scenarios and dollar values, so both are keyed; the
+    # value to two significant figures, so price ticks don't defeat the cache
+    scenarios_signature = _signature((sc['name'], round(sc['impact'])) for sc in results['scenarios'])
+    cache_key = (f"insights_{portfolio_signature(portfolio_summary)}_{scenarios_signature}"
+                 f"_{results['current_value']:.2g}_{round(results['loss_percentage'])}_{round(results['gain_percentage'])}")
+    cached_insights = _ai_cache.get(cache_key)
+    if cached_insights is not None:
+        log.info("Reusing cached AI insights")
+        return cached_insights
+    
+    try:
+        # Create prompt for comprehensive analysis
+        holdings = '\n'.join(
+            f"- {s['ticker']} ({s['name']}): ${s['value']:,.2f} ({s['percentage']:.1f}%), Sector: {s['sector']}"
+            for s in portfolio_summary
+        )
+        scenarios = '\n'.join(f"- {sc['name']}: {sc['impact']:+.0f}% impact" for sc in results['scenarios'])
+        prompt = _INSIGHTS_PROMPT.format(
+            current_value=results['current_value'],
+            num_holdings=len(portfolio_summary),
+            loss_percentage=results['loss_percentage'],
+            gain_percentage=results['gain_percentage'],
+            holdings=holdings,
+            scenarios=scenarios
+        )
         
         # Call Gemini API
-        response = model.generate_content(prompt)
+        response = _get_model().generate_content(prompt, request_options={"timeout": GEMINI_TIMEOUT})
         
-        print(f"✅ AI Insights generated successfully")
+        log.info("AI insights generated successfully")
+        _ai_cache.set(cache_key, response.text)
         return response.text
         
     except Exception as e:
-        print(f"❌ Error generating AI insights: {e}")
+        log.error("Error generating AI insights: %s", e)
         # Fallback to simple analysis if API fails
-        num_stocks = len(stock_details)
+        num_stocks = len(portfolio_summary)
         loss_pct = results['loss_percentage']
         gain_pct = results['gain_percentage']
         
         return f"Your portfolio of {num_stocks} stocks shows potential losses of up to {loss_pct:.1f}% in downside scenarios and gains of up to {gain_pct:.1f}% in bull markets. Consider rebalancing to optimize your risk-reward profile. Current portfolio value is ${results['current_value']:,.2f}."
 
+# Expanded list of popular stocks across all sectors
+COMMON_STOCKS = [
+    # Top Tech
+    'AAPL', 'MSFT', 'GOOGL', 'GOOG', 'AMZN', 'NVDA', 'META', 'TSLA', 
+    'AVGO', 'ORCL', 'ADBE', 'CRM', 'CSCO', 'ACN', 'AMD', 'INTC', 'IBM',
+    'QCOM', 'TXN', 'INTU', 'NOW', 'AMAT', 'MU', 'LRCX', 'KLAC', 'SNPS',
+    'CDNS', 'MRVL', 'FTNT', 'PANW', 'CRWD', 'DDOG', 'NET', 'ZS',
+    
+    # Finance
+    'BRK-B', 'JPM', 'V', 'MA', 'BAC', 'WFC', 'GS', 'MS', 'BLK', 'SCHW',
+    'AXP', 'C', 'SPGI', 'BX', 'KKR', 'PGR', 'CB', 'MMC', 'ICE', 'CME',
+    
+    # Healthcare
+    'UNH', 'JNJ', 'LLY', 'ABBV', 'MRK', 'TMO', 'ABT', 'DHR', 'PFE',
+    'BMY', 'AMGN', 'GILD', 'CVS', 'CI', 'HUM', 'MCK', 'ELV', 'REGN',
+    'VRTX', 'ISRG', 'SYK', 'BSX', 'MDT', 'ZTS', 'DXCM',
+    
+    # Consumer
+    'WMT', 'HD', 'MCD', 'NKE', 'SBUX', 'TGT', 'LOW', 'TJX', 'COST',
+    'PG', 'KO', 'PEP', 'PM', 'MO', 'MDLZ', 'CL', 'KMB', 'GIS', 'HSY',
+    
+    # Communication
+    'DIS', 'NFLX', 'CMCSA', 'T', 'VZ', 'TMUS', 'CHTR', 'EA', 'TTWO',
+    
+    # Industrial & Energy
+    'BA', 'CAT', 'GE', 'HON', 'UNP', 'RTX', 'LMT', 'DE', 'MMM',
+    'XOM', 'CVX', 'COP', 'SLB', 'EOG', 'MPC', 'PSX', 'VLO',
+    
+    # Auto & Transport
+    'TSLA', 'F', 'GM', 'UBER', 'LYFT', 'DAL', 'UAL', 'AAL', 'LUV',
+    
+    # Aerospace & Defense
+    'RKLB',  # Rocket Lab
+    'LMT', 'BA', 'RTX', 'GD', 'NOC', 'TDG', 'HWM', 'LHX',
+    
+    # Retail & E-commerce
+    'AMZN', 'BABA', 'JD', 'MELI', 'SE', 'SHOP', 'ETSY', 'W', 'CHWY',
+    
+    # Semiconductors
+    'NVDA', 'TSM', 'AVGO', 'ASML', 'AMD', 'INTC', 'QCOM', 'TXN',
+    'AMAT', 'LRCX', 'KLAC', 'MU', 'NXPI', 'MCHP', 'ADI', 'ON',
+    
+    # Cloud & SaaS
+    'CRM', 'ORCL', 'ADBE', 'NOW', 'INTU', 'WDAY', 'TEAM', 'ZM',
+    'SNOW', 'DDOG', 'CRWD', 'ZS', 'OKTA', 'VEEV', 'BILL',
+    
+    # EV & Clean Energy
+    'TSLA', 'RIVN', 'LCID', 'NIO', 'XPEV', 'LI', 'ENPH', 'SEDG',
+    
+    # Crypto & Fintech
+    'COIN', 'XYZ', 'PYPL', 'HOOD', 'SOFI', 'AFRM', 'NU',
+    
+    # Biotech
+    'MRNA', 'BNTX', 'NVAX', 'BIIB', 'ILMN', 'INCY', 'BMRN', 'ALNY',
+    
+    # REITs
+    'PLD', 'AMT', 'CCI', 'EQIX', 'PSA', 'DLR', 'O', 'WELL', 'AVB',
+    
+    # Misc
+    'PLTR', 'RBLX', 'U', 'DASH', 'ABNB', 'SPOT', 'PINS', 'SNAP',
+
+    # Market Indices
+    '^DJI', '^GSPC', 'GC=F', '^IXIC', '^RUT', '^VIX'
+]
+
+# Display names for the catalogue, bundled so search never waits on Yahoo
+with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'stock_names.json')) as f:
+    STOCK_NAMES = json.load(f)
+
+# Deduplicated catalogue (first occurrence wins, so popularity order is kept)
+_STOCKS = tuple(dict.fromkeys(COMMON_STOCKS))
+
+# Index every 1-3 character prefix so short queries are a single dict hit;
+# index tickers are also filed without the caret so "GSPC" finds "^GSPC"
+PREFIX_INDEX_LENGTH = 3
+_buckets = defaultdict(list)
+for _ticker in _STOCKS:
+    for _name in (_ticker, _ticker[1:]) if _ticker.startswith('^') else (_ticker,):
+        for _length in range(1, min(PREFIX_INDEX_LENGTH, len(_name)) + 1):
+            _buckets[_name[:_length]].append(_ticker)
+_BY_PREFIX = {prefix: tuple(tickers) for prefix, tickers in _buckets.items()}
+del _buckets, _ticker, _name, _length
+
+# O(1) exact-match lookups against the catalogue
+_KNOWN_TICKERS = frozenset(_STOCKS)
+
 @app.route('/api/stress-test', methods=['POST', 'OPTIONS'])
 @cross_origin()
 def stress_test():
@@ -281,70 +956,150 @@ def stress_test():
     if request.method == 'OPTIONS':
         return '', 204
     
+    # Set when the request fails before streaming, so the background
+    # scenario task skips (or at least doesn't cache) its Gemini call
+    cancelled = threading.Event()
     try:
         data = request.json
         portfolio = data.get('portfolio', [])
         
-        print(f"Received portfolio: {portfolio}")
+        log.debug("Received portfolio: %s", portfolio)
         
         if not portfolio:
-            return jsonify({'error': 'Portfolio is empty'}), 400
-        
-        # Calculate current portfolio value
-        current_value, stock_details = calculate_portfolio_value(portfolio)
+            return _json_response({'error': 'Portfolio is empty'}, 400)
         
-        if current_value == 0:
-            return jsonify({'error': 'Unable to fetch stock data. Please check ticker symbols.'}), 500
+        # Reject malformed lots up front rather than valuing them
+        try:
+            aggregate_holdings(portfolio)
+        except (KeyError, TypeError, AttributeError, ValueError) as e:
+            return _json_response({'error': f"Invalid portfolio: {e}"}, 400)
         
-        # Generate AI-powered stress scenarios
-        print("🤖 Generating AI-powered scenarios...")
-        scenarios = generate_stress_scenarios(stock_details, current_value)
+        # The scenario task waits on the same coalesced price fetch as the
+        # valuation below, then calls Gemini; each scenario is queued as it
+        # streams in, and None marks the end of generation
+        log.info("Generating AI-powered scenarios")
+        streamed_scenarios = queue.Queue()
+        scenarios_future = _ai_executor.submit(generate_stress_scenarios, portfolio, streamed_scenarios.put, cancelled)
+        scenarios_future.add_done_callback(lambda _: streamed_scenarios.put(None))
         
-        # Run stress scenarios
-        scenario_results, worst_case_value, best_case_value = run_stress_scenarios(
-            scenarios, current_value, stock_details
-        )
+        # Calculate current portfolio value
+        current_value, stock_details, portfolio_arrays = calculate_portfolio_value(portfolio)
         
-        potential_loss = current_value - worst_case_value
-        loss_percentage = (potential_loss / current_value) * 100
-        
-        potential_gain = best_case_value - current_value
-        gain_percentage = (potential_gain / current_value) * 100
-        
-        results = {
-            'current_value': current_value,
-            'worst_case_value': worst_case_value,
-            'best_case_value': best_case_value,
-            'potential_loss': potential_loss,
-            'loss_percentage': loss_percentage,
-            'potential_gain': potential_gain,
-            'gain_percentage': gain_percentage,
-            'scenarios': scenario_results,
-            'stock_details': stock_details
-        }
+        if current_value == 0:
+            cancelled.set()
+            return _json_response({'error': 'Unable to fetch stock data. Please check ticker symbols.'}, 500)
         
-        # Generate AI insights
-        ai_insights = generate_ai_insights(portfolio, results, stock_details)
+        # Holding weights feed the insights prompt
+        percentages = portfolio_arrays.values / current_value * 100
+        portfolio_summary = [
+            {**stock, 'percentage': float(percentage)}
+            for stock, percentage in zip(stock_details, percentages)
+        ]
         
-        print(f"Stress test completed successfully")
+        def generate():
+            # Valuation is known as soon as prices arrive, so send it before
+            # waiting on Gemini for scenarios and then for insights
+            yield orjson.dumps({
+                'type': 'prices',
+                'current_value': current_value,
+                'stock_details': stock_details
+            }) + b'\n'
+            
+            try:
+                # Forward each scenario result while the rest are still generating
+                for scenario in iter(streamed_scenarios.get, None):
+                    try:
+                        scenario_result = run_stress_scenarios([scenario], current_value, portfolio_arrays)[0][0]
+                    except (KeyError, TypeError, ValueError):
+                        # Malformed partials are left for the final results to settle
+                        continue
+                    yield orjson.dumps({
+                        'type': 'scenario',
+                        'scenario': scenario_result
+                    }, option=orjson.OPT_SERIALIZE_NUMPY) + b'\n'
+                
+                # Collect the AI-powered stress scenarios started above
+                scenarios = scenarios_future.result()
+                
+                # Run stress scenarios
+                scenario_results, worst_case_value, best_case_value = run_stress_scenarios(
+                    scenarios, current_value, portfolio_arrays
+                )
+                
+                potential_loss = current_value - worst_case_value
+                loss_percentage = (potential_loss / current_value) * 100
+                
+                potential_gain = best_case_value - current_value
+                gain_percentage = (potential_gain / current_value) * 100
+                
+                results = {
+                    'current_value': current_value,
+                    'worst_case_value': worst_case_value,
+                    'best_case_value': best_case_value,
+                    'potential_loss': potential_loss,
+                    'loss_percentage': loss_percentage,
+                    'potential_gain': potential_gain,
+                    'gain_percentage': gain_percentage,
+                    'scenarios': scenario_results,
+                    'stock_details': stock_details
+                }
+                
+                yield orjson.dumps({
+                    'type': 'results',
+                    'results': results,
+                    'timestamp': datetime.now()
+                }, option=orjson.OPT_SERIALIZE_NUMPY) + b'\n'
+                
+                # Insights describe the results, so they can only start once those are sent
+                ai_insights = generate_ai_insights(portfolio_summary, results)
+                
+                log.info("Stress test completed successfully")
+                
+                yield orjson.dumps({
+                    'type': 'insights',
+                    'ai_insights': ai_insights
+                }) + b'\n'
+            
+            except Exception as e:
+                # Headers are already sent, so report the failure in-stream
+                log.exception("Error in stress test stream: %s", e)
+                yield orjson.dumps({'type': 'error', 'error': str(e)}) + b'\n'
         
-        return jsonify({
-            'results': results,
-            'ai_insights': ai_insights,
-            'timestamp': datetime.now().isoformat()
-        })
+        # Negotiated like Flask-Compress: "gzip;q=0" is a refusal, not an offer
+        if request.accept_encodings['gzip'] > 0:
+            response = Response(stream_with_context(_gzip_lines(generate())), mimetype='application/x-ndjson')
+            response.headers['Content-Encoding'] = 'gzip'
+        else:
+            response = Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+        response.vary.add('Accept-Encoding')
+        return response
     
     except Exception as e:
-        print(f"Error in stress test: {e}")
-        import traceback
-        traceback.print_exc()
-        return jsonify({'error': str(e)}), 500
+        cancelled.set()
+        log.exception("Error in stress test: %s", e)
+        return _json_response({'error': str(e)}, 500)
+
+# Bursts of health checks share one formatted timestamp per second
+_health_stamp = (0.0, '')
 
 @app.route('/api/health', methods=['GET'])
 @cross_origin()
 def health():
     """Health check endpoint"""
-    return jsonify({'status': 'healthy', 'timestamp': datetime.now().isoformat()})
+    global _health_stamp
+    now = time.monotonic()
+    if now - _health_stamp[0] >= 1.0:
+        _health_stamp = (now, datetime.now().isoformat())
+    return _json_response({
+        'status': 'healthy',
+        'timestamp': _health_stamp[1],
+        'cache': {
+            'prices': _price_cache.stats(),
+            'metadata': _meta_cache.stats(),
+            'scenarios': _scenario_cache.stats(),
+            'ai': _ai_cache.stats()
+        }
+    })
 
 @app.route('/api/validate-ticker', methods=['POST', 'OPTIONS'])
 @cross_origin()
@@ -358,28 +1113,41 @@ def validate_ticker():
         ticker = data.get('ticker', '').strip().upper()
         
         if not ticker:
-            return jsonify({'valid': False, 'error': 'Ticker is required'}), 400
+            return _json_response({'valid': False, 'error': 'Ticker is required'}, 400)
+        
+        # Catalogue tickers with a cached price are answered without Yahoo;
+        # anything else (including catalogue names Yahoo has stopped pricing)
+        # goes through the network check below
+        if ticker in _KNOWN_TICKERS:
+            cached_price = _price_cache.get(f"{resolve_symbol(ticker)}_quote")
+            if cached_price is not None:
+                return _json_response({
+                    'valid': True,
+                    'ticker': ticker,
+                    'name': STOCK_NAMES.get(ticker, ticker),
+                    'current_price': cached_price
+                })
         
         # Try to fetch stock data
         stock_data = get_stock_data(ticker)
         
         if stock_data and stock_data['current_price'] > 0:
-            return jsonify({
+            return _json_response({
                 'valid': True,
                 'ticker': ticker,
                 'name': stock_data['name'],
                 'current_price': stock_data['current_price']
             })
         else:
-            return jsonify({
+            return _json_response({
                 'valid': False,
                 'ticker': ticker,
                 'error': 'Ticker not found or no price data available'
             })
     
     except Exception as e:
-        print(f"Error validating ticker: {e}")
-        return jsonify({'valid': False, 'error': str(e)}), 500
+        log.error("Error validating ticker: %s", e)
+        return _json_response({'valid': False, 'error': str(e)}, 500)
 
 @app.route('/api/search-stocks', methods=['GET', 'OPTIONS'])
 @cross_origin()
@@ -392,103 +1160,43 @@ def search_stocks():
         query = request.args.get('q', '').strip().upper()
         
         if not query or len(query) < 1:
-            return jsonify({'results': []})
+            return _json_response({'results': []})
         
         # Check if query should match index tickers (ones with ^)
         query_with_caret = '^' + query
         
-        # Expanded list of popular stocks across all sectors
-        common_stocks = [
-            # Top Tech
-            'AAPL', 'MSFT', 'GOOGL', 'GOOG', 'AMZN', 'NVDA', 'META', 'TSLA', 
-            'AVGO', 'ORCL', 'ADBE', 'CRM', 'CSCO', 'ACN', 'AMD', 'INTC', 'IBM',
-            'QCOM', 'TXN', 'INTU', 'NOW', 'AMAT', 'MU', 'LRCX', 'KLAC', 'SNPS',
-            'CDNS', 'MRVL', 'FTNT', 'PANW', 'CRWD', 'DDOG', 'NET', 'ZS',
-            
-            # Finance
-            'BRK.B', 'JPM', 'V', 'MA', 'BAC', 'WFC', 'GS', 'MS', 'BLK', 'SCHW',
-            'AXP', 'C', 'SPGI', 'BX', 'KKR', 'PGR', 'CB', 'MMC', 'ICE', 'CME',
-            
-            # Healthcare
-            'UNH', 'JNJ', 'LLY', 'ABBV', 'MRK', 'TMO', 'ABT', 'DHR', 'PFE',
-            'BMY', 'AMGN', 'GILD', 'CVS', 'CI', 'HUM', 'MCK', 'ELV', 'REGN',
-            'VRTX', 'ISRG', 'SYK', 'BSX', 'MDT', 'ZTS', 'DXCM',
-            
-            # Consumer
-            'WMT', 'HD', 'MCD', 'NKE', 'SBUX', 'TGT', 'LOW', 'TJX', 'COST',
-            'PG', 'KO', 'PEP', 'PM', 'MO', 'MDLZ', 'CL', 'KMB', 'GIS', 'HSY',
-            
-            # Communication
-            'DIS', 'NFLX', 'CMCSA', 'T', 'VZ', 'TMUS', 'CHTR', 'EA', 'TTWO',
-            
-            # Industrial & Energy
-            'BA', 'CAT', 'GE', 'HON', 'UNP', 'RTX', 'LMT', 'DE', 'MMM',
-            'XOM', 'CVX', 'COP', 'SLB', 'EOG', 'MPC', 'PSX', 'VLO',
-            
-            # Auto & Transport
-            'TSLA', 'F', 'GM', 'UBER', 'LYFT', 'DAL', 'UAL', 'AAL', 'LUV',
-            
-            # Aerospace & Defense
-            'RKLB',  # Rocket Lab
-            'LMT', 'BA', 'RTX', 'GD', 'NOC', 'TDG', 'HWM', 'LHX',
-            
-            # Retail & E-commerce
-            'AMZN', 'BABA', 'JD', 'MELI', 'SE', 'SHOP', 'ETSY', 'W', 'CHWY',
-            
-            # Semiconductors
-            'NVDA', 'TSM', 'AVGO', 'ASML', 'AMD', 'INTC', 'QCOM', 'TXN',
-            'AMAT', 'LRCX', 'KLAC', 'MU', 'NXPI', 'MCHP', 'ADI', 'ON',
-            
-            # Cloud & SaaS
-            'CRM', 'ORCL', 'ADBE', 'NOW', 'INTU', 'WDAY', 'TEAM', 'ZM',
-            'SNOW', 'DDOG', 'CRWD', 'ZS', 'OKTA', 'VEEV', 'BILL',
-            
-            # EV & Clean Energy
-            'TSLA', 'RIVN', 'LCID', 'NIO', 'XPEV', 'LI', 'ENPH', 'SEDG',
-            
-            # Crypto & Fintech
-            'COIN', 'SQ', 'PYPL', 'HOOD', 'SOFI', 'AFRM', 'NU',
-            
-            # Biotech
-            'MRNA', 'BNTX', 'NVAX', 'BIIB', 'ILMN', 'INCY', 'BMRN', 'ALNY',
-            
-            # REITs
-            'PLD', 'AMT', 'CCI', 'EQIX', 'PSA', 'DLR', 'O', 'WELL', 'AVB',
-            
-            # Misc
-            'PLTR', 'RBLX', 'U', 'DASH', 'ABNB', 'SPOT', 'PINS', 'SNAP',
-
-            # Market Indices
-            '^DJI', '^GSPC', 'GC=F', '^IXIC', '^RUT', '^VIX'
-        ]
-        
-        # Find all stocks that start with the query (priority)
-        matching_tickers = [
-            ticker for ticker in common_stocks 
-            if ticker.startswith(query) or ticker.startswith(query_with_caret)
-        ]
+        # Find all stocks that start with the query (priority); buckets are
+        # exact for short queries and only need filtering for longer ones
+        bucket = _BY_PREFIX.get(query[:PREFIX_INDEX_LENGTH], ())
+        if len(query) <= PREFIX_INDEX_LENGTH:
+            matching_tickers = list(bucket)
+        else:
+            matching_tickers = [
+                ticker for ticker in bucket
+                if ticker.startswith(query) or ticker.startswith(query_with_caret)
+            ]
         
         # If no startswith matches, try contains
         if not matching_tickers:
             matching_tickers = [
-                ticker for ticker in common_stocks 
+                ticker for ticker in _STOCKS
                 if query in ticker or query_with_caret in ticker
             ]
         
+        # An exact ticker hit always leads, even if the catalogue lists it late
+        # (e.g. "T" would otherwise be crowded out by TSLA, TXN, TMO, ...)
+        if query in _KNOWN_TICKERS:
+            matching_tickers = [query] + [ticker for ticker in matching_tickers if ticker != query]
+        
         # Limit results
         matching_tickers = matching_tickers[:8]
         
-        # Fetch details for matching stocks
-        results = []
-        for ticker in matching_tickers:
-            stock_data = get_stock_data(ticker)
-            if stock_data and stock_data['current_price'] > 0:
-                results.append({
-                    'ticker': ticker,
-                    'name': stock_data['name'],
-                    'price': stock_data['current_price'],
-                    'sector': stock_data.get('sector', 'Unknown')
-                })
+        # Catalogue matches are answered from the bundled names; the client
+        # backfills their prices with one batched /api/quote?tickers= call
+        results = [
+            {'ticker': ticker, 'name': STOCK_NAMES.get(ticker, ticker)}
+            for ticker in matching_tickers
+        ]
         
         # If still no results and query looks complete, try exact yfinance lookup
         if not results and len(query) >= 1:
@@ -501,25 +1209,74 @@ def search_stocks():
                     'sector': stock_data.get('sector', 'Unknown')
                 })
         
-        return jsonify({'results': results})
+        return _json_response({'results': results})
+    
+    except Exception as e:
+        log.error("Error searching stocks: %s", e)
+        return _json_response({'results': []}, 500)
+
+@app.route('/api/quote', methods=['GET', 'OPTIONS'])
+@cross_origin()
+def quote():
+    """Return the latest price for one ticker, or for a comma-separated batch"""
+    if request.method == 'OPTIONS':
+        return '', 204
+    
+    try:
+        # Batch form (?tickers=A,B,C) is answered with a single Yahoo request
+        tickers = [t.strip().upper() for t in request.args.get('tickers', '').split(',') if t.strip()]
+        if tickers:
+            prices = get_stock_prices(tickers[:YF_BATCH_SIZE])
+            return _json_response({'quotes': {t: price for t, price in prices.items() if price > 0}})
+        
+        ticker = request.args.get('ticker', '').strip().upper()
+        
+        if not ticker:
+            return _json_response({'error': 'Ticker is required'}, 400)
+        
+        current_price = get_stock_price(ticker)
+        
+        if current_price <= 0:
+            return _json_response({'ticker': ticker, 'error': 'No price data available'}, 404)
+        
+        return _json_response({
+            'ticker': ticker,
+            'name': STOCK_NAMES.get(ticker, ticker),
+            'price': current_price
+        })
     
     except Exception as e:
-        print(f"Error searching stocks: {e}")
-        return jsonify({'results': []}), 500
+        log.error("Error fetching quote: %s", e)
+        return _json_response({'error': str(e)}, 500)
+
+# Filled with the port in use when the dev server starts
+STARTUP_BANNER = """\
+🚀 Portfolio Stress Testing Backend Starting...
+📊 Dependencies:
+   pip3 install flask flask-cors flask-compress brotli yfinance numpy orjson google-generativeai python-dotenv gunicorn
+
+✅ Server starting on http://localhost:{port}
+🌐 CORS enabled for http://localhost:3000
+
+Endpoints:
+   GET  /api/health
+   GET  /api/search-stocks?q=<query>
+   GET  /api/quote?ticker=<ticker> | ?tickers=<a,b,c>
+   POST /api/validate-ticker
+   POST /api/stress-test
+
+🤖 AI-Powered Features:
+   - Dynamic scenario generation (3 downside + 3 upside)
+   - Portfolio-specific risk/reward analysis
+
+🏭 Production: gunicorn -c gunicorn.conf.py (from the project root)
+
+""" + "=" * 50
 
 if __name__ == '__main__':
-    print("🚀 Portfolio Stress Testing Backend Starting...")
-    print("📊 Dependencies:")
-    print("   pip3 install flask flask-cors yfinance google-generativeai python-dotenv")
-    print("\n✅ Server starting on http://localhost:5001")
-    print("🌐 CORS enabled for http://localhost:3000")
-    print("\nEndpoints:")
-    print("   GET  /api/health")
-    print("   GET  /api/search-stocks?q=<query>")
-    print("   POST /api/validate-ticker")
-    print("   POST /api/stress-test")
-    print("\n🤖 AI-Powered Features:")
-    print("   - Dynamic scenario generation (3 downside + 3 upside)")
-    print("   - Portfolio-specific risk/reward analysis")
-    print("\n" + "="*50)
-    app.run(debug=True, port=5001, host='0.0.0.0')
\ No newline at end of file
+    port = int(os.getenv('PORT', 5001))
+    if os.getenv('QUIET') != '1':
+        print(STARTUP_BANNER.format(port=port))
+    # Debugger and reloader are opt-in for local development only
+    debug = os.getenv('FLASK_DEBUG') == '1'
+    app.run(port=port, host='0.0.0.0', debug=debug, use_reloader=debug)
\ No newline at end of file
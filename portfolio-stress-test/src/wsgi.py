@@ -0,0 +1,2 @@
+"""WSGI entry point for serving the backend with Gunicorn"""
+from App import app